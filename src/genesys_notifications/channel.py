@@ -1,52 +1,115 @@
 import asyncio
-from random import choices
-from datetime import datetime, timedelta
-from string import ascii_letters, digits
+import time
+from secrets import token_hex
 import logging
 import websockets
-import ujson
-from websockets.exceptions import ConnectionClosed, InvalidStatusCode, \
+import orjson
+from websockets.exceptions import ConnectionClosed, InvalidStatus, \
                                   InvalidURI, WebSocketException
-from pending import Pending
 from .exceptions import ChannelFailure, ConnectionFailure, AuthorizationFailure, \
                         InitializationFailure, LifetimeExtensionFailure, \
                         ReconnectFailure, SubscriptionFailure, RolloverFailure, \
                         ChannelExpiring, ReceiveFailure, RecoveryFailure
 from .exceptions import REASON
-from .timeouts import TIMEOUT
+from .timeouts import TIMEOUT, Timeouts
+
+
+_default_logger = logging.getLogger(__name__)
+_default_logger.addHandler(logging.NullHandler())
+
+# heartbeats are by far the most frequent frames; recognize them without JSON decoding
+_HEARTBEAT = b'"WebSocket Heartbeat"'
+_METADATA = b'"channel.metadata"'
+
+# manual health check request
+_PING = orjson.dumps({"message": "ping"}).decode()
+
+# topics used by Genesys for channel control messages rather than notification data
+_CONTROL_TOPICS = frozenset(("channel.metadata", "v2.system.socket_closing"))
+
+# results only taken as control messages when carrying a message
+_FAILURES = frozenset(("400", "404"))
 
 
 class Channel:
     "notifications source with error handling, lifetime extension and rollover"
 
+    __slots__ = ("_uri", "_topics", "_subscription", "_autoextend", "_reconnect", "_logger",
+                 "_lifetime", "_expiration", "_heartbeat_timeout", "_response_timeout",
+                 "_timeouts", "_connection", "_timeouthandler", "_reader", "_discarding", "_recovery",
+                 "_queue", "_extensions", "_rollovers", "_dispatch", "_timeout_handlers")
+
     @property
     def expired(self) -> bool:
         "has the channel exceeded its 24 hour lifetime defined by Genesys"
-        return True if datetime.now() >= self._timeouts[TIMEOUT.ChannelExpired].expected else False
+        return time.monotonic() >= self._expiration
 
     @property
     def connected(self) -> bool:
-        return True if self._connection else False
+        return self._connection is not None
 
 
     def __init__(self, uri, topics, lifetime=82800, autoextend=True, reconnect=True, logger=None):
         self._uri = uri
         self._topics = topics
+        # serialized subscription request up to the correlation id value
+        self._subscription = orjson.dumps({
+            "message": "subscribe",
+            "topics": topics
+        })[:-1].decode() + ',"correlationId":"'
         self._autoextend = autoextend
         self._reconnect = reconnect
-        if not logger:
-            logging.basicConfig()
-            logger = logging.getLogger("channel")
-            logger.setLevel(logging.DEBUG)
-        self._logger = logger
+        self._logger = logger or _default_logger
         self._lifetime = lifetime
+        self._expiration = time.monotonic() + lifetime
         self._heartbeat_timeout = 40
         self._response_timeout = 7
-        self._timeouts = Pending()
+        self._timeouts = Timeouts()
         self._connection = None
+        self._timeouthandler = None
+        self._reader = None
+        self._discarding = set()
+        # the receiver and timeout handler may both attempt recovery at once
+        self._recovery = asyncio.Lock()
+        self._queue = asyncio.Queue(maxsize=256)
         self._extensions = 0
         self._rollovers = 0
 
+        # control messages keyed by only the fields they are told apart by: (topicName,
+        # channel.metadata message), (topicName,), (result, status) or (result,);
+        # anything else is notification data
+        self._dispatch = {
+            # Periodic heartbeat message from Genesys
+            ("channel.metadata", "WebSocket Heartbeat"): self.handle_heartbeat,
+            # Manual health check response
+            ("channel.metadata", "pong"): self.handle_healthcheck_reply,
+            # Genesys is going to close the connection in a minute;
+            # raise ChannelExpiring to signal need for rollover
+            ("v2.system.socket_closing",): self.handle_close_warning,
+            # Failure because
+            # 1) channel has already expired
+            # 2) channel has been replaced by another due to quota overrun
+            # 3) auth token used for the channel has expired
+            ("404",): self.handle_404,
+            # Topic(s) subscription responses
+            ("200", "subscribed"): self.handle_subscription_success,
+            ("400", "failure"): self.handle_subscription_failure,
+            ("400", "error"): self.handle_subscription_failure,
+        }
+
+        self._timeout_handlers = {
+            TIMEOUT.ChannelExpired: self.handle_ChannelExpired,
+            TIMEOUT.NoHeartbeat: self.handle_NoHeartbeat,
+            TIMEOUT.NoHealthCheckResponse: self.handle_NoHealthCheckResponse,
+            TIMEOUT.NoSubscriptionConfirmation: self.handle_NoSubscriptionConfirmation,
+        }
+
+    @staticmethod
+    def install_uvloop():
+        "use the libuv based uvloop event loop for reduced per-message overhead"
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
     def __aiter__(self):
         "return the asynchronous iterable"
         return self
@@ -57,34 +120,48 @@ class Channel:
 
     async def initialize(self):
         "establish websocket connection and subscribe to topics"
-        self._timeouts = Pending()
+        # any current connection and its timeouts stay in use until the new connection is up
+        connection, reader = self._connection, self._reader
+        timeouts, self._timeouts = self._timeouts, Timeouts()
+        # scheduled up front as messages are processed as soon as the connection is open
+        self._timeouts.schedule(TIMEOUT.ChannelExpired, self._lifetime)
+        self._timeouts.schedule(TIMEOUT.NoHeartbeat, self._heartbeat_timeout)
         try:
             await self.connect()
             await self.subscribe()
         except (ConnectionFailure, SubscriptionFailure) as exc:
+            if self._connection is not connection:
+                await self.disconnect()
+            self._connection, self._reader = connection, reader
+            self._timeouts = timeouts
             raise InitializationFailure(exc.reason, original=exc) from exc
         else:
-            self._timeouts.schedule(TIMEOUT.ChannelExpired, self._lifetime)
-            self._timeouts.schedule(TIMEOUT.NoHeartbeat, self._heartbeat_timeout)
+            self._expiration = time.monotonic() + self._lifetime
+            # on rollover the replaced watcher is never in the middle of handling a timeout,
+            # as rollover holds the recovery lock
+            self._cancel_timeouthandler()
+            self._timeouthandler = asyncio.create_task(self.watch_timeouts())
             self._logger.debug("successfully initialized the channel")
 
 
     async def connect(self):
         "open websocket connection"
         try:
-            self._connection = await websockets.connect(self._uri, ping_timeout=1, ping_interval=1)
+            self._connection = await websockets.connect(self._uri, ping_timeout=20, ping_interval=20, compression=None)
         except InvalidURI as exc:
             raise ConnectionFailure(reason=REASON.InvalidURI, original=exc) from exc
-        except InvalidStatusCode as exc:
-            if exc.status_code == 401:
+        except InvalidStatus as exc:
+            status_code = exc.response.status_code
+            if status_code == 401:
                 raise AuthorizationFailure(reason=REASON.HTTPUnauthorized, original=exc) from exc
-            elif exc.status_code == 403:
+            elif status_code == 403:
                 raise AuthorizationFailure(reason=REASON.HTTPForbidden, original=exc) from exc
             else:
                 raise ConnectionFailure(reason=REASON.InvalidStatusCode, original=exc) from exc
         except WebSocketException as exc:
             raise ConnectionFailure(reason=REASON.Ambiguous, original=exc) from exc
         else:
+            self._reader = asyncio.create_task(self.receive(self._connection, self._timeouts))
             self._logger.info("connected")
 
 
@@ -92,64 +169,89 @@ class Channel:
         "subscribe to topics"
         if not self.connected:
             raise SubscriptionFailure(REASON.ConnectionClosed)
-        correlation_id = ''.join(choices(ascii_letters + digits, k=16))
-        subscription = {
-            "message":"subscribe",
-            "topics": self._topics,
-            "correlationId": correlation_id
-        }
-        self._logger.debug(f"sending:\n{subscription}")
-        await self._connection.send(ujson.dumps(subscription))
+        # only the correlation id changes between subscriptions
+        subscription = self._subscription + token_hex(8) + '"}'
+        self._logger.debug("sending:\n%s", subscription)
         self._timeouts.schedule(TIMEOUT.NoSubscriptionConfirmation, self._response_timeout)
+        try:
+            await self._connection.send(subscription)
+        except WebSocketException as exc:
+            raise SubscriptionFailure(REASON.ConnectionClosed, original=exc) from exc
 
 
     async def __anext__(self):
         "asynchronous iterable for getting Notifications Channel JSON messages over websocket"
 
-        notification = None
+        # run in a loop here so that successful recovery can happen transparently from upstream point of view
+        while True:
+
+            # receiver and timeout handler queue failures along with the notifications
+            item = await self._queue.get()
+
+            if isinstance(item, WebSocketException):
+                # failure of an already replaced connection needs no recovery
+                if self._reader and not self._reader.done():
+                    continue
+                await self.handle_websocket_failure(item)
+                continue
 
-        # run in a lopp here so that successful recovery can happen transparently from upstream point of view
-        while not notification:
+            if isinstance(item, Exception):
+                raise item
 
-            # wait for either data to arrive or expiry getting triggered
-            receiver = asyncio.create_task(self._connection.recv())
-            timeouthandler = asyncio.create_task(self.handle_timeouts())
-            (done, _) = await asyncio.wait((receiver, timeouthandler), return_when=asyncio.FIRST_COMPLETED)
-            _.pop().cancel()
-            task = done.pop()
+            # release successfully retrieved message for processing
+            return item
+
+
+    async def receive(self, connection, timeouts):
+        "receive and process messages in the background, queueing notifications and failures"
+        # timeouts of this connection; once replaced, its control messages are no longer of concern
+        while True:
             try:
-                data = task.result()
+                # undecoded frames; orjson parses UTF-8 bytes directly
+                data = await connection.recv(decode=False)
             except WebSocketException as exc:
-                recovered = await self.handle_websocket_failure(exc)
-                if recovered:
-                    continue
-            # other exceptions are left uncaught, they should bubble up
-            else:
-                # successful timeout recovery
-                if not data:
-                    continue
-                try:
-                    message = ujson.loads(data)
-                except ValueError:
-                    self.handle_invalid_json(data)
+                # recovery is up to the iterating side
+                await self._queue.put(exc)
+                return
+            try:
+                replaced = timeouts is not self._timeouts
+                if _HEARTBEAT in data and _METADATA in data:
+                    # handled directly, bypassing process(); a fresh message for each handler call
+                    notification = None if replaced else self.handle_heartbeat(
+                        {"topicName": "channel.metadata", "eventBody": {"message": "WebSocket Heartbeat"}})
                 else:
-                    notification = self.process(message)
-
-        # release successfully retrieved message for processing
-        return notification
+                    msg = self.decode(data)
+                    notification = None if replaced and self._handler_for(msg) else self.process(msg)
+            except Exception as exc:
+                notification = exc
+            if notification:
+                await self._queue.put(notification)
+
+    def decode(self, data):
+        "decode JSON message received over websocket"
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            self.handle_invalid_json(data)
 
 
     async def handle_websocket_failure(self, exc):
         self._logger.error("unexpected connection failure: %s", type(exc).__name__)
         if self._reconnect:
-            try:
-                await self.reconnect()
-            except WebSocketException as exc:
-                self._logger.error("could not recover from connection failure: %s", type(exc).__name__)
-                raise RecoveryFailure(reason=REASON.Ambiguous, original=exc) from exc
-            else:
-                self._logger.info("successfully recovered from connection failure")
-                return True
+            connection = self._connection
+            async with self._recovery:
+                # nothing to do if a concurrent recovery already replaced the connection
+                if self.connected and self._connection is not connection:
+                    self._logger.debug("channel already reconnected")
+                    return True
+                try:
+                    await self.reconnect()
+                except WebSocketException as exc:
+                    self._logger.error("could not recover from connection failure: %s", type(exc).__name__)
+                    raise RecoveryFailure(reason=REASON.Ambiguous, original=exc) from exc
+                else:
+                    self._logger.info("successfully recovered from connection failure")
+                    return True
         else:
             raise ReceiveFailure(reason=REASON.Ambiguous, original=exc) from exc
 
@@ -161,91 +263,71 @@ class Channel:
     def process(self, msg):
         "process JSON messages received over websocket from Genesys"
 
-        self._logger.debug(f"received:\n{msg}")
+        self._logger.debug("received:\n%s", msg)
 
-        match msg:
+        handler = self._handler_for(msg)
 
-            #  Periodic heartbeat message from Genesys
-            case {
-                    "topicName": "channel.metadata",
-                    "eventBody":{
-                        "message":"WebSocket Heartbeat"
-                    }
-                }:
-                self.handle_heartbeat()
+        # nothing matched so actual notification data; pass it thru
+        return handler(msg) if handler else msg
 
-            # Failure because
-            # 1) channel has already expired
-            # 2) channel has been replaced by another due to quota overrun
-            # 3) auth token used for the channel has expired
-            case {
-                    "result": "404",
-                    "message": msg
-                }:
-                self.handle_404(msg)
+    def _handler_for(self, msg):
+        "look up the handler of a control message"
 
-            # Manual health check response
-            case {
-                    "topicName": "channel.metadata",
-                    "eventBody": {
-                        "message": "pong"
-                    }
-                }:
-                self.handle_healthcheck_reply()
+        # control messages are JSON objects; pass anything else thru
+        if not isinstance(msg, dict):
+            return None
 
-            # Genesys is going to close the connection in a minute;
-            # raise ChannelExpiring to signal need for rollover
-            case {
-                    "topicName": "v2.system.socket_closing"
-                }:
-                self.handle_close_warning()
+        topic = msg.get("topicName")
 
-            # Topic(s) subscription responses
-            case {
-                    "result": "200",
-                    "status": "subscribed"
-                }:
-                self.handle_subscription_success()
-
-            case {
-                    "result": "400",
-                    "status": "failure" | "error",
-                    "message": msg
-                }:
-                self.handle_subscription_failure(msg)
-
-            # nothing matched so actual notification data; pass it thru
-            case _:
-                return msg
-
-    def handle_heartbeat(self):
+        # notification data carries neither a control topic nor a result
+        if topic not in _CONTROL_TOPICS and "result" not in msg:
+            return None
+
+        try:
+            # control topics first, channel metadata is told apart by its message
+            if topic == "channel.metadata":
+                body = msg.get("eventBody")
+                handler = self._dispatch.get((topic, body.get("message"))) if isinstance(body, dict) else None
+            else:
+                handler = self._dispatch.get((topic,))
+
+            # then results, failures only along with a message
+            result = msg.get("result")
+            if not handler and result and (result not in _FAILURES or "message" in msg):
+                handler = self._dispatch.get((result, msg.get("status"))) or self._dispatch.get((result,))
+        except TypeError:
+            # unhashable field values match nothing
+            return None
+
+        return handler
+
+    def handle_heartbeat(self, msg):
         self._logger.debug("got heartbeat")
-        self._timeouts.reschedule(TIMEOUT.NoHeartbeat)
+        self._timeouts.touch(TIMEOUT.NoHeartbeat)
 
     def handle_404(self, msg):
-        raise ChannelFailure(REASON.Ambiguous, message=msg)
+        raise ChannelFailure(REASON.Ambiguous, message=msg.get("message"))
 
-    def handle_healthcheck_reply(self):
+    def handle_healthcheck_reply(self, msg):
         self._logger.info("got health check reply")
         self._timeouts.cancel(TIMEOUT.NoHealthCheckResponse)
 
-    def handle_close_warning(self):
+    def handle_close_warning(self, msg):
         self._logger.warning("received close warning, rollover required to avoid channel shutdown")
         raise ChannelExpiring(REASON.ChannelClosing)
 
-    def handle_subscription_success(self):
+    def handle_subscription_success(self, msg):
         self._logger.info("topic subscription successful")
         self._timeouts.cancel(TIMEOUT.NoSubscriptionConfirmation)
 
     def handle_subscription_failure(self, msg):
-        raise SubscriptionFailure(REASON.Ambiguous, message=msg)
+        raise SubscriptionFailure(REASON.Ambiguous, message=msg.get("message"))
 
     async def check(self):
         "send a health check"
-        msg = {"message": "ping"}
-        await self._connection.send(ujson.dumps(msg))
-        self._logger.debug("health check sent")
         self._timeouts.schedule(TIMEOUT.NoHealthCheckResponse, self._response_timeout)
+        await self._connection.send(_PING)
+        self._logger.debug("health check sent")
 
     async def extend(self):
         "extend channel lifetime by resubscribing to the topics"
@@ -256,29 +338,41 @@ class Channel:
             raise LifetimeExtensionFailure(exc.reason) from exc
         else:
             self._extensions += 1
-            self._timeouts.reschedule(TIMEOUT.ChannelExpired)
+            # the expiry event is no longer pending once it has been triggered
+            self._timeouts.schedule(TIMEOUT.ChannelExpired, self._lifetime)
+            self._expiration = time.monotonic() + self._lifetime
             self._logger.debug("successfully extended the channel lifetime (round %i)", self._extensions)
-            expiry_at = self._timeouts[TIMEOUT.ChannelExpired].expected.isoformat(" ", timespec="seconds")
-            self._logger.info("next managed expiry scheduled at %s", expiry_at)
+            if self._logger.isEnabledFor(logging.INFO):
+                expiry_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() + self._lifetime))
+                self._logger.info("next managed expiry scheduled at %s", expiry_at)
 
 
+    async def disconnect(self):
+        "stop receiving and close the websocket connection"
+        if self._reader:
+            self._reader.cancel()
+            self._reader = None
+        if self._connection:
+            try:
+                await self._connection.close()
+            except ConnectionClosed:
+                pass
+            self._connection = None
+
     async def close(self):
-        "close the websocket connection"
+        "stop timeout handling and close the websocket connection"
         self._logger.warning("attempting to close the channel now")
-        try:
-            await self._connection.close()
-        except ConnectionClosed:
-            pass
-        self._connection = None
+        self._cancel_timeouthandler()
+        await self.disconnect()
+        # finish closing any connections replaced by rollover
+        if self._discarding:
+            await asyncio.gather(*self._discarding, return_exceptions=True)
         self._logger.warning("notification channel is now closed")
 
 
     async def reconnect(self):
         "re-establish websocket connection"
-        try:
-            await self.close()
-        except ConnectionClosed:
-            pass
+        await self.disconnect()
         self._logger.debug("attempting to reconnect the channel")
         try:
             await self.connect()
@@ -292,36 +386,64 @@ class Channel:
     async def rollover(self, uri):
         "re-establish a new connection to a new URI with same subscriptions"
 
-        # keep ref to old connection for closing
-        self._old_connection = self._connection
+        # timeout handling and failure recovery wait until the rollover is done
+        async with self._recovery:
 
-        # attempt to open the new uri
-        self._uri = uri
-        try:
-            await self.initialize()
-        except InitializationFailure as exc:
-            raise RolloverFailure(exc.reason) from exc
-        else:
+            # keep ref to old connection and its receiver for closing; it keeps
+            # delivering notifications until the new connection is up
+            old_connection, old_reader = self._connection, self._reader
+
+            # attempt to open the new uri
+            old_uri, self._uri = self._uri, uri
             try:
-                await self._old_connection.close()
-            except ConnectionClosed:
-                pass
-            self._rollovers += 1
-            del self._old_connection
-            self._logger.debug("successfully rolled over to a new URI (round %i)", self._rollovers)
+                await self.initialize()
+            except InitializationFailure as exc:
+                # carry on with the old connection
+                self._uri = old_uri
+                raise RolloverFailure(exc.reason) from exc
+            else:
+                # the closing handshake does not hold up the new connection
+                discarding = asyncio.create_task(self.discard(old_connection, old_reader))
+                self._discarding.add(discarding)
+                discarding.add_done_callback(self._discarded)
+                self._rollovers += 1
+                self._logger.debug("successfully rolled over to a new URI (round %i)", self._rollovers)
+
+    async def discard(self, connection, reader):
+        "stop receiving from and close a replaced websocket connection"
+        reader.cancel()
+        try:
+            await connection.close()
+        except ConnectionClosed:
+            pass
+
+    def _discarded(self, task):
+        self._discarding.discard(task)
+        if not task.cancelled() and (exc := task.exception()):
+            self._logger.warning("could not close a replaced connection: %s", type(exc).__name__)
+
 
+    def _cancel_timeouthandler(self):
+        if self._timeouthandler:
+            self._timeouthandler.cancel()
+            self._timeouthandler = None
+
+    async def watch_timeouts(self):
+        "handle timeouts in the background, queueing failures"
+        while True:
+            try:
+                await self.handle_timeouts()
+            except Exception as exc:
+                await self._queue.put(exc)
 
     async def handle_timeouts(self):
-        event = await self._timeouts
-        match event:
-            case TIMEOUT.ChannelExpired:
-                await self.handle_ChannelExpired()
-            case TIMEOUT.NoHeartbeat:
-                await self.handle_NoHeartbeat()
-            case TIMEOUT.NoHealthCheckResponse:
-                await self.handle_NoHealthCheckResponse()
-            case TIMEOUT.NoSubscriptionConfirmation:
-                await self.handle_NoSubscriptionConfirmation()
+        timeouts = self._timeouts
+        event = await timeouts
+        # recovery is serialized with rollover and connection failure handling
+        async with self._recovery:
+            # timeouts replaced by a rollover meanwhile are no longer of concern
+            if timeouts is self._timeouts:
+                await self._timeout_handlers[event]()
 
 
     async def handle_ChannelExpired(self):
@@ -334,6 +456,7 @@ class Channel:
     async def handle_NoHeartbeat(self):
         self._logger.error("heartbeat timed out")
         await self.reconnect()
+        self._timeouts.schedule(TIMEOUT.NoHeartbeat, self._heartbeat_timeout)
 
     async def handle_NoHealthCheckResponse(self):
         self._logger.error("health check response timed out")
@@ -1,3 +1,6 @@
+import asyncio
+import time
+from collections import namedtuple
 from enum import Enum
 
 
@@ -5,4 +8,67 @@ class TIMEOUT(Enum):
     ChannelExpired = 1 # Genesys closes the connection after 24 hours
     NoHeartbeat = 2 # Genesys normally sends heartbeats every 30 seconds
     NoHealthCheckResponse = 3 # Manual healthcheck received no response
-    NoSubscriptionConfirmation = 4 # Channel topic subscription was not confirmed
\ No newline at end of file
+    NoSubscriptionConfirmation = 4 # Channel topic subscription was not confirmed
+
+
+Schedule = namedtuple('Schedule', ['delay', 'expected'])
+
+
+class Timeouts:
+    "awaitable set of scheduled timeouts tracked as monotonic deadlines"
+
+    def __init__(self):
+        self._delays = {}
+        self._deadlines = {}
+        self._waiter = None
+
+    def schedule(self, event, seconds):
+        "schedule a timeout for # of seconds from now, replacing any earlier one"
+        self._delays[event] = seconds
+        self._deadlines[event] = time.monotonic() + seconds
+        # the new deadline may be the nearest one
+        self._wake()
+
+    def touch(self, event):
+        "push a scheduled timeout forward in time by its original # of seconds, if scheduled"
+        if event in self._delays:
+            self._deadlines[event] = time.monotonic() + self._delays[event]
+
+    def cancel(self, event):
+        "cancel a timeout, if scheduled"
+        self._deadlines.pop(event, None)
+        self._delays.pop(event, None)
+
+    def seconds_to_next(self):
+        "seconds until the nearest timeout is due, or None if nothing is scheduled"
+        if self._deadlines:
+            return min(self._deadlines.values()) - time.monotonic()
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __getitem__(self, event):
+        return Schedule(self._delays[event], self._deadlines[event])
+
+    def __await__(self):
+        return self.wait().__await__()
+
+    async def wait(self):
+        "wait for the nearest timeout to become due, then unschedule and return it"
+        loop = asyncio.get_running_loop()
+        while (delay := self.seconds_to_next()) is None or delay > 0:
+            self._waiter = loop.create_future()
+            timer = loop.call_later(delay, self._wake) if delay is not None else None
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+                if timer:
+                    timer.cancel()
+        event = min(self._deadlines, key=self._deadlines.get)
+        self.cancel(event)
+        return event
+
+    def _wake(self):
+        if self._waiter and not self._waiter.done():
+            self._waiter.set_result(None)
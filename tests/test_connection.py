@@ -1,6 +1,6 @@
 import asyncio
 from unittest.mock import AsyncMock, patch
-import json
+import orjson
 import pytest
 from pytest import mark
 
@@ -11,7 +11,7 @@ class MockConnection:
     _correlationID = None
 
     async def send(self, msg):
-        msg = json.loads(msg)
+        msg = orjson.loads(msg)
 
         if msg["message"] == "subscribe":
             self._action = "subscribe"
@@ -19,7 +19,7 @@ class MockConnection:
         if cid := msg.get("correlationId"):
             self._correlationID = cid
     
-    async def recv(self):
+    async def recv(self, decode=None):
         response = {}
 
         if self._correlationID:
@@ -28,7 +28,11 @@ class MockConnection:
         if self._action == "subscribe":
             response["status"] = "subscribed"
 
-        return json.dumps(response)
+        response = orjson.dumps(response)
+        return response if decode is False else response.decode()
+
+    async def close(self):
+        pass
 
 
 
@@ -44,3 +48,308 @@ async def test_connection_awaiting():
     assert isinstance(channel._connection, MockConnection)
 
     await channel.subscribe()
+    await channel.close()
+
+
+class MockStream:
+    "connection replaying given frames, then waiting for more"
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.sent = []
+        self.closed = False
+
+    async def send(self, msg):
+        self.sent.append(orjson.loads(msg))
+
+    async def recv(self, decode=None):
+        if not self.frames:
+            await asyncio.Event().wait()
+        frame = self.frames.pop(0)
+        if isinstance(frame, Exception):
+            raise frame
+        return frame if decode is False else frame.decode()
+
+    async def close(self):
+        self.closed = True
+
+
+class SlowClosingStream(MockStream):
+    "connection taking a while to close, as a dead one does"
+
+    async def close(self):
+        await asyncio.sleep(0.1)
+        self.closed = True
+
+
+class SlowSendingStream(MockStream):
+    "connection taking a while to send"
+
+    async def send(self, msg):
+        await asyncio.sleep(0.1)
+        await super().send(msg)
+
+
+class FailingSendStream(MockStream):
+    "connection closed before anything could be sent"
+
+    async def send(self, msg):
+        from websockets.exceptions import ConnectionClosedError
+        raise ConnectionClosedError(None, None)
+
+
+HEARTBEAT = orjson.dumps({"topicName": "channel.metadata", "eventBody": {"message": "WebSocket Heartbeat"}})
+SUBSCRIBED = orjson.dumps({"result": "200", "status": "subscribed"})
+
+
+def notification(n):
+    return {"topicName": "v2.test", "eventBody": {"n": n}}
+
+
+@mark.asyncio
+async def test_notification_iteration():
+    from genesys_notifications import Channel
+    frames = [SUBSCRIBED, orjson.dumps(notification(1)), HEARTBEAT, orjson.dumps(notification(2))]
+    with patch("websockets.connect", AsyncMock(return_value=MockStream(frames))):
+        channel = Channel("wss://test", ["v2.test"])
+        await channel
+        assert await channel.__anext__() == notification(1)
+        assert await channel.__anext__() == notification(2)
+        await channel.close()
+
+
+@mark.asyncio
+async def test_invalid_message():
+    from genesys_notifications import Channel
+    from genesys_notifications.exceptions import ReceiveFailure, REASON
+    frames = [SUBSCRIBED, b"not json", orjson.dumps(notification(1))]
+    with patch("websockets.connect", AsyncMock(return_value=MockStream(frames))):
+        channel = Channel("wss://test", ["v2.test"])
+        await channel
+        with pytest.raises(ReceiveFailure) as excinfo:
+            await channel.__anext__()
+        assert excinfo.value.reason == REASON.InvalidMessage
+        assert await channel.__anext__() == notification(1)
+        await channel.close()
+
+
+@mark.asyncio
+async def test_invalid_message_ignored():
+    from genesys_notifications import Channel
+
+    class TolerantChannel(Channel):
+        def handle_invalid_json(self, data):
+            pass
+
+    frames = [SUBSCRIBED, b"not json", b"null", b'["v2.test"]', orjson.dumps(notification(1))]
+    with patch("websockets.connect", AsyncMock(return_value=MockStream(frames))):
+        channel = TolerantChannel("wss://test", ["v2.test"])
+        await channel
+        assert await channel.__anext__() == ["v2.test"]
+        assert await channel.__anext__() == notification(1)
+        await channel.close()
+
+
+@mark.asyncio
+async def test_reconnect_on_connection_failure():
+    from genesys_notifications import Channel
+    from websockets.exceptions import ConnectionClosedError
+    failing = MockStream([SUBSCRIBED, orjson.dumps(notification(1)), ConnectionClosedError(None, None)])
+    replacement = MockStream([orjson.dumps(notification(2))])
+    connect = AsyncMock(side_effect=[failing, replacement])
+    with patch("websockets.connect", connect):
+        channel = Channel("wss://test", ["v2.test"])
+        await channel
+        assert await channel.__anext__() == notification(1)
+        assert await channel.__anext__() == notification(2)
+        assert connect.await_count == 2
+        await channel.close()
+
+
+@mark.asyncio
+async def test_lifetime_extension():
+    from genesys_notifications import Channel
+    stream = MockStream([SUBSCRIBED])
+    with patch("websockets.connect", AsyncMock(return_value=stream)):
+        channel = Channel("wss://test", ["v2.test"], lifetime=0.01)
+        await channel
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(channel.__anext__(), 0.1)
+        assert channel._extensions >= 1
+        assert len(stream.sent) == channel._extensions + 1
+        assert all(msg["message"] == "subscribe" for msg in stream.sent)
+        await channel.close()
+
+
+@mark.asyncio
+async def test_rollover():
+    from genesys_notifications import Channel
+    old = MockStream([SUBSCRIBED, orjson.dumps(notification(1))])
+    new = MockStream([SUBSCRIBED, orjson.dumps(notification(2))])
+    connect = AsyncMock(side_effect=[old, new])
+    with patch("websockets.connect", connect):
+        channel = Channel("wss://test", ["v2.test"])
+        await channel
+        assert await channel.__anext__() == notification(1)
+        await channel.rollover("wss://test2")
+        assert connect.await_args.args == ("wss://test2",)
+        assert await channel.__anext__() == notification(2)
+        assert old.closed and not new.closed
+        assert new.sent[0]["topics"] == ["v2.test"]
+        await channel.close()
+
+
+@mark.asyncio
+async def test_consecutive_rollovers():
+    from genesys_notifications import Channel
+    streams = [SlowClosingStream([SUBSCRIBED]) for _ in range(3)]
+    with patch("websockets.connect", AsyncMock(side_effect=streams)):
+        channel = Channel("wss://test", ["v2.test"])
+        await channel
+        await channel.rollover("wss://test2")
+        await channel.rollover("wss://test3")
+        assert len(channel._discarding) == 2
+        await channel.close()
+        assert all(stream.closed for stream in streams)
+        assert not channel._discarding
+
+
+@mark.asyncio
+async def test_heartbeat_timeout_during_rollover():
+    from genesys_notifications import Channel
+    old = MockStream([SUBSCRIBED])
+    new = SlowSendingStream([SUBSCRIBED, orjson.dumps(notification(1))])
+    connect = AsyncMock(side_effect=[old, new, MockStream([])])
+    with patch("websockets.connect", connect):
+        channel = Channel("wss://test", ["v2.test"])
+        channel._heartbeat_timeout = 0.05
+        await channel
+        channel._heartbeat_timeout = 40
+        await asyncio.sleep(0.01)
+        # old connection heartbeat times out while subscribing over the new one
+        await channel.rollover("wss://test2")
+        assert connect.await_count == 2
+        assert channel._connection is new and not channel._reader.done()
+        assert await asyncio.wait_for(channel.__anext__(), 1) == notification(1)
+        assert old.closed and not new.closed
+        await channel.close()
+
+
+@mark.asyncio
+async def test_failed_rollover():
+    from genesys_notifications import Channel
+    from genesys_notifications.exceptions import RolloverFailure
+    from websockets.exceptions import InvalidURI
+    old = MockStream([SUBSCRIBED, orjson.dumps(notification(1))])
+    replacement = MockStream([orjson.dumps(notification(2))])
+    connect = AsyncMock(side_effect=[old, InvalidURI("wss://test2", "invalid"), replacement])
+    with patch("websockets.connect", connect):
+        channel = Channel("wss://test", ["v2.test"])
+        channel._heartbeat_timeout = 0.05
+        await channel
+        with pytest.raises(RolloverFailure):
+            await channel.rollover("wss://test2")
+        assert await channel.__anext__() == notification(1)
+        # old connection keeps its timeout handling; missing heartbeat triggers a reconnect
+        channel._heartbeat_timeout = 40
+        assert await asyncio.wait_for(channel.__anext__(), 1) == notification(2)
+        assert connect.await_args.args == ("wss://test",)
+        await channel.close()
+
+
+@mark.asyncio
+async def test_rollover_subscription_failure():
+    from genesys_notifications import Channel
+    from genesys_notifications.exceptions import RolloverFailure, REASON
+    old = MockStream([SUBSCRIBED, orjson.dumps(notification(1))])
+    new = FailingSendStream([orjson.dumps(notification(2))])
+    with patch("websockets.connect", AsyncMock(side_effect=[old, new])):
+        channel = Channel("wss://test", ["v2.test"])
+        await channel
+        timeouts = channel._timeouts
+        with pytest.raises(RolloverFailure) as excinfo:
+            await channel.rollover("wss://test2")
+        assert excinfo.value.reason == REASON.ConnectionClosed
+        assert channel._connection is old and channel._timeouts is timeouts
+        assert new.closed and not old.closed
+        assert await channel.__anext__() == notification(1)
+        await channel.close()
+
+
+@mark.asyncio
+async def test_control_messages_of_replaced_connection():
+    from genesys_notifications import Channel
+    from genesys_notifications.timeouts import TIMEOUT, Timeouts
+    closing = orjson.dumps({"topicName": "v2.system.socket_closing", "eventBody": {"message": "closing"}})
+    channel = Channel("wss://test", ["v2.test"])
+    channel._timeouts.schedule(TIMEOUT.NoSubscriptionConfirmation, 7)
+    replaced = MockStream([SUBSCRIBED, closing, HEARTBEAT, orjson.dumps(notification(1))])
+    reader = asyncio.create_task(channel.receive(replaced, Timeouts()))
+    # notifications still get delivered, control messages are dropped
+    assert await asyncio.wait_for(channel._queue.get(), 1) == notification(1)
+    assert channel._queue.empty()
+    assert channel._timeouts[TIMEOUT.NoSubscriptionConfirmation]
+    reader.cancel()
+
+
+@mark.asyncio
+async def test_managed_expiry_without_autoextend():
+    from genesys_notifications import Channel
+    from genesys_notifications.exceptions import ChannelExpiring, REASON
+    with patch("websockets.connect", AsyncMock(return_value=MockStream([SUBSCRIBED]))):
+        channel = Channel("wss://test", ["v2.test"], lifetime=0.01, autoextend=False)
+        await channel
+        with pytest.raises(ChannelExpiring) as excinfo:
+            await asyncio.wait_for(channel.__anext__(), 1)
+        assert excinfo.value.reason == REASON.ChannelExpired
+        assert channel.expired
+        await channel.close()
+
+
+@mark.asyncio
+async def test_reconnect_on_missing_heartbeat():
+    from genesys_notifications import Channel
+    replacement = MockStream([HEARTBEAT, orjson.dumps(notification(1))])
+    connect = AsyncMock(side_effect=[MockStream([SUBSCRIBED]), replacement])
+    with patch("websockets.connect", connect):
+        channel = Channel("wss://test", ["v2.test"])
+        channel._heartbeat_timeout = 0.01
+        await channel
+        assert await asyncio.wait_for(channel.__anext__(), 1) == notification(1)
+        assert connect.await_count == 2
+        await channel.close()
+
+
+@mark.asyncio
+async def test_connection_failure_during_heartbeat_reconnect():
+    from genesys_notifications import Channel
+    from websockets.exceptions import ConnectionClosedError
+    failing = SlowClosingStream([SUBSCRIBED, ConnectionClosedError(None, None)])
+    replacement = MockStream([orjson.dumps(notification(1))])
+    connect = AsyncMock(side_effect=[failing, replacement, MockStream([])])
+    with patch("websockets.connect", connect):
+        channel = Channel("wss://test", ["v2.test"])
+        channel._heartbeat_timeout = 0.05
+        await channel
+        # connection failure gets picked up while the heartbeat reconnect is still closing
+        await asyncio.sleep(0.07)
+        channel._heartbeat_timeout = 40
+        assert await asyncio.wait_for(channel.__anext__(), 1) == notification(1)
+        assert connect.await_count == 2
+        assert failing.closed and channel._connection is replacement
+        await channel.close()
+
+
+@mark.asyncio
+async def test_connection_unauthorized():
+    from genesys_notifications import Channel
+    from genesys_notifications.exceptions import AuthorizationFailure, REASON
+    from websockets.datastructures import Headers
+    from websockets.exceptions import InvalidStatus
+    from websockets.http11 import Response
+    rejection = InvalidStatus(Response(401, "Unauthorized", Headers()))
+    with patch("websockets.connect", AsyncMock(side_effect=rejection)):
+        channel = Channel("wss://test", ["v2.test"])
+        with pytest.raises(AuthorizationFailure) as excinfo:
+            await channel.connect()
+        assert excinfo.value.reason == REASON.HTTPUnauthorized
@@ -0,0 +1,78 @@
+import time
+import pytest
+from pytest import mark
+from genesys_notifications import Channel
+from genesys_notifications.exceptions import ChannelExpiring, ChannelFailure, SubscriptionFailure
+from genesys_notifications.timeouts import TIMEOUT
+
+
+@pytest.fixture
+def channel():
+    channel = Channel("wss://test", ["test_topic1"])
+    channel._timeouts.schedule(TIMEOUT.NoHeartbeat, 40)
+    channel._timeouts.schedule(TIMEOUT.NoHealthCheckResponse, 7)
+    channel._timeouts.schedule(TIMEOUT.NoSubscriptionConfirmation, 7)
+    return channel
+
+
+def test_heartbeat(channel):
+    msg = {"topicName": "channel.metadata", "eventBody": {"message": "WebSocket Heartbeat"}}
+    expected = channel._timeouts[TIMEOUT.NoHeartbeat].expected
+    time.sleep(0.01)
+    assert channel.process(msg) is None
+    assert channel._timeouts[TIMEOUT.NoHeartbeat].expected > expected
+
+
+def test_healthcheck_reply(channel):
+    msg = {"topicName": "channel.metadata", "eventBody": {"message": "pong"}}
+    assert channel.process(msg) is None
+    with pytest.raises(KeyError):
+        channel._timeouts[TIMEOUT.NoHealthCheckResponse]
+
+
+@mark.parametrize("msg", [
+    {"result": "200", "status": "subscribed", "correlationId": "abc"},
+    {"topicName": "v2.test", "result": "200", "status": "subscribed"},
+])
+def test_subscription_success(channel, msg):
+    assert channel.process(msg) is None
+    with pytest.raises(KeyError):
+        channel._timeouts[TIMEOUT.NoSubscriptionConfirmation]
+
+
+def test_duplicate_subscription_success(channel):
+    msg = {"result": "200", "status": "subscribed", "correlationId": "abc"}
+    channel.process(msg)
+    assert channel.process(msg) is None
+
+
+@mark.parametrize("msg, exception", [
+    ({"result": "404", "message": "channel expired"}, ChannelFailure),
+    ({"result": "404", "status": "failure", "message": "channel expired"}, ChannelFailure),
+    ({"topicName": "v2.test", "result": "404", "message": "channel expired"}, ChannelFailure),
+    ({"result": "400", "status": "failure", "message": "bad topic"}, SubscriptionFailure),
+    ({"result": "400", "status": "error", "message": "bad topic"}, SubscriptionFailure),
+    ({"topicName": "v2.test", "result": "400", "status": "failure", "message": "bad topic"}, SubscriptionFailure),
+    ({"topicName": "v2.system.socket_closing", "eventBody": {"message": "closing"}}, ChannelExpiring),
+    ({"topicName": "v2.system.socket_closing", "result": "200"}, ChannelExpiring),
+])
+def test_control_failures(channel, msg, exception):
+    with pytest.raises(exception) as excinfo:
+        channel.process(msg)
+    if "message" in msg:
+        assert excinfo.value.message == msg["message"]
+
+
+@mark.parametrize("msg", [
+    {"topicName": "v2.analytics.queues.id.observations", "eventBody": {"message": "pong"}},
+    {"topicName": "channel.metadata", "eventBody": "WebSocket Heartbeat"},
+    {"correlationId": "abc", "status": "subscribed"},
+    {"result": "404"},
+    {"result": "400", "status": "failure"},
+    {"result": ["404"], "message": "unhashable"},
+    ["channel.metadata", "pong"],
+    "WebSocket Heartbeat",
+    None,
+])
+def test_notification_passthru(channel, msg):
+    assert channel.process(msg) is msg
@@ -0,0 +1,47 @@
+import asyncio
+from pytest import mark
+from genesys_notifications.timeouts import TIMEOUT, Timeouts
+
+
+@mark.asyncio
+async def test_nearest_timeout_first():
+    timeouts = Timeouts()
+    timeouts.schedule(TIMEOUT.NoHeartbeat, 0.05)
+    timeouts.schedule(TIMEOUT.NoSubscriptionConfirmation, 0.01)
+    assert await timeouts == TIMEOUT.NoSubscriptionConfirmation
+    assert await timeouts == TIMEOUT.NoHeartbeat
+    assert len(timeouts) == 0
+
+
+@mark.asyncio
+async def test_touch_postpones_timeout():
+    timeouts = Timeouts()
+    timeouts.schedule(TIMEOUT.NoHeartbeat, 0.05)
+    expected = timeouts[TIMEOUT.NoHeartbeat].expected
+    await asyncio.sleep(0.01)
+    timeouts.touch(TIMEOUT.NoHeartbeat)
+    assert timeouts[TIMEOUT.NoHeartbeat].expected > expected
+    # a late reply to an already handled timeout is ignored
+    timeouts.touch(TIMEOUT.NoHealthCheckResponse)
+    assert len(timeouts) == 1
+
+
+@mark.asyncio
+async def test_schedule_wakes_waiter():
+    timeouts = Timeouts()
+    timeouts.schedule(TIMEOUT.ChannelExpired, 3600)
+    waiter = asyncio.create_task(timeouts.wait())
+    await asyncio.sleep(0)
+    timeouts.schedule(TIMEOUT.NoHealthCheckResponse, 0.01)
+    assert await asyncio.wait_for(waiter, 1) == TIMEOUT.NoHealthCheckResponse
+    assert len(timeouts) == 1
+
+
+@mark.asyncio
+async def test_cancel():
+    timeouts = Timeouts()
+    timeouts.schedule(TIMEOUT.NoHealthCheckResponse, 0.01)
+    timeouts.cancel(TIMEOUT.NoHealthCheckResponse)
+    assert timeouts.seconds_to_next() is None
+    timeouts.cancel(TIMEOUT.NoHealthCheckResponse)
+    assert len(timeouts) == 0